@@ -1,13 +1,49 @@
-import requests
-from bs4 import BeautifulSoup
-from urllib.parse import urlparse
-import math
+import requests_cache
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from selectolax.lexbor import LexborHTMLParser
+from urllib.parse import urlparse, urljoin
+from concurrent.futures import ThreadPoolExecutor
+from carbon_metrics import CarbonMetrics
+import functools
+import zlib
+import numpy as np
 
 # Constants for calculations
 KWH_PER_GB = 1.805  # kilowatt-hours per gigabyte of data transfer
 CARBON_PER_KWH = 442  # grams of CO2 per kilowatt-hour (global average)
 TREE_ABSORPTION = 21  # kg of CO2 absorbed per tree per year
 
+# Folded form of the methodology below: kg of CO2 per KB of page weight per monthly visit, over a year
+_KG_PER_KB_VISIT_YEAR = (12 * KWH_PER_GB * CARBON_PER_KWH) / (1024 * 1024 * 1000)
+
+HTML_PARSE_CAP = 512 * 1024  # bytes of HTML parsed for resource discovery
+HTML_SIZE_LIMIT = 16 * 1024 * 1024  # wire bytes read at most from a page without Content-Length
+RESOURCE_TIMEOUT = (2, 3)  # (connect, read) seconds per resource request
+PAGE_TIMEOUT = 10  # seconds for the main HTML document
+
+# Shared HTTP session so keep-alive connections are reused per host, backed by
+# an on-disk cache that revalidates with ETag/Last-Modified across runs. Only
+# HEADs are cached: requests-cache reads a cacheable body in full before
+# returning, which would defeat streaming the page GET and the ranged GETs
+_SESSION = requests_cache.CachedSession(
+    '.webecometer_cache',
+    backend='sqlite',
+    cache_control=True,
+    expire_after=3600,
+    allowable_methods=('HEAD',)
+)
+_RETRY = Retry(total=1, connect=1, read=0, backoff_factor=0.1, status_forcelist=[502, 503, 504])
+_SESSION.mount('https://', HTTPAdapter(pool_connections=16, pool_maxsize=32, max_retries=_RETRY))
+_SESSION.mount('http://', HTTPAdapter(pool_connections=16, pool_maxsize=32, max_retries=_RETRY))
+_SESSION.headers.update({'Accept-Encoding': 'gzip, deflate', 'User-Agent': 'WebEcoMeter/1.0'})
+
+# Tags that reference resources we size; matched inside the C parser
+_RESOURCE_SELECTOR = 'script[src], link[href], img[src]'
+
+# <link> relations that only hint at or describe other documents; they add no page weight
+_SKIPPED_LINK_RELS = {'dns-prefetch', 'preconnect', 'alternate', 'canonical', 'icon'}
+
 def validate_url(url: str) -> bool:
     """Validate if the provided URL is properly formatted."""
     try:
@@ -16,7 +52,7 @@ def validate_url(url: str) -> bool:
     except:
         return False
 
-def get_page_size(url: str) -> float:
+def get_page_size(url: str, max_assets: int = 64, refresh: bool = False) -> float:
     """
     Get the page size in KB.
 
@@ -26,6 +62,10 @@ def get_page_size(url: str) -> float:
     3. Retrieves size information for each resource
     4. Sums up the total transfer size
 
+    At most max_assets resources are measured; on pages that link more, the
+    measured total is scaled up by the unmeasured fraction to bound latency.
+    With refresh, cached resource responses are re-requested and overwritten.
+
     Note: This represents the initial page load size and may vary based on:
     - Browser caching
     - Dynamic content loading
@@ -33,32 +73,98 @@ def get_page_size(url: str) -> float:
     - Compression methods used
     """
     try:
-        response = requests.get(url, stream=True)
+        response = _SESSION.get(url, stream=True, timeout=PAGE_TIMEOUT)
         response.raise_for_status()
 
-        # Get initial HTML size
-        soup = BeautifulSoup(response.content, 'html.parser')
-        total_size = len(response.content)
-
-        # Add sizes of all resources (css, js, images)
-        for tag in soup.find_all(['script', 'link', 'img']):
-            src = tag.get('src') or tag.get('href')
-            if src:
-                if not src.startswith(('http://', 'https://')):
-                    if not src.startswith('/'):
-                        src = '/' + src
-                    src = f"{response.url.rstrip('/')}{src}"
-                try:
-                    resource = requests.get(src, stream=True)
-                    total_size += int(resource.headers.get('content-length', 0))
-                except:
-                    continue
+        # Keep at most HTML_PARSE_CAP bytes for parsing; resource references live
+        # near the top. Without Content-Length, keep reading (not storing) the rest
+        # up to HTML_SIZE_LIMIT. Read undecoded so the count is the transferred size
+        has_length = 'content-length' in response.headers
+        chunks = []
+        wire_size = 0
+        for chunk in response.raw.stream(65536, decode_content=False):
+            if wire_size < HTML_PARSE_CAP:
+                chunks.append(chunk)
+            wire_size += len(chunk)
+            if has_length and wire_size >= HTML_PARSE_CAP:
+                break
+            if wire_size >= HTML_SIZE_LIMIT:
+                break
+        response.close()
+
+        # Get initial HTML size, even when the parsed copy was truncated
+        html = _decode_prefix(b''.join(chunks), response.headers.get('content-encoding', ''))
+        tree = LexborHTMLParser(html)
+        total_size = int(response.headers.get('content-length', wire_size))
+
+        # Add sizes of all resources (css, js, images), each unique URL once
+        seen = set()
+        urls = []
+        for node in tree.css(_RESOURCE_SELECTOR):
+            src = node.attributes.get('src') or node.attributes.get('href')
+            if not src:
+                continue
+            rel = (node.attributes.get('rel') or '').lower().split()
+            if node.tag == 'link' and _SKIPPED_LINK_RELS.intersection(rel):
+                continue
+            src = urljoin(response.url, src)
+            if src in seen:
+                continue
+            seen.add(src)
+            urls.append(src)
+        sampled = urls[:max_assets]
+        if sampled:
+            with ThreadPoolExecutor(max_workers=16) as executor:
+                sampled_size = sum(executor.map(functools.partial(_fetch_size, refresh=refresh), sampled))
+            total_size += sampled_size * (len(urls) / len(sampled))
 
         return total_size / 1024  # Convert to KB
     except Exception as e:
         raise Exception(f"Error fetching page size: {str(e)}")
 
-def calculate_carbon_footprint(page_size_kb: float, monthly_visits: int = 10000) -> dict:
+def _decode_prefix(data: bytes, encoding: str) -> bytes:
+    """Decompress a possibly truncated gzip/deflate body, keeping at most HTML_PARSE_CAP bytes."""
+    if encoding.strip().lower() not in ('gzip', 'deflate'):
+        return data
+    try:
+        # MAX_WBITS | 32 auto-detects gzip and zlib headers
+        return zlib.decompressobj(zlib.MAX_WBITS | 32).decompress(data, HTML_PARSE_CAP)
+    except zlib.error:
+        try:
+            # Some servers send raw deflate without the zlib header
+            return zlib.decompressobj(-zlib.MAX_WBITS).decompress(data, HTML_PARSE_CAP)
+        except zlib.error:
+            return b''
+
+def _fetch_size(src: str, refresh: bool = False) -> int:
+    """
+    Get a resource's size in bytes without downloading its body.
+
+    Uses a HEAD request; if the server omits Content-Length (or reports 0 for
+    a successful response, as chunked CDN responses do), falls back to a
+    single-byte ranged GET and reads the total from Content-Range (or from
+    Content-Length when the server ignores the range and answers 200).
+    """
+    try:
+        resource = _SESSION.head(src, allow_redirects=True, timeout=RESOURCE_TIMEOUT, force_refresh=refresh)
+        content_length = resource.headers.get('content-length')
+        if content_length is not None and (int(content_length) > 0 or resource.status_code != 200):
+            return int(content_length)
+
+        resource = _SESSION.get(src, headers={'Range': 'bytes=0-0'}, timeout=RESOURCE_TIMEOUT, stream=True)
+        content_range = resource.headers.get('content-range', '')
+        full_length = resource.headers.get('content-length')
+        resource.close()
+        # Servers that ignore Range answer 200 with the whole body; its length is the size
+        if resource.status_code == 200 and full_length is not None:
+            return int(full_length)
+        if '/' in content_range and not content_range.endswith('/*'):
+            return int(content_range.rsplit('/', 1)[-1])
+        return 0
+    except Exception:
+        return 0
+
+def calculate_carbon_footprint(page_size_kb: float, monthly_visits: int = 10000) -> CarbonMetrics:
     """
     Calculate carbon footprint metrics based on page size and traffic.
 
@@ -94,22 +200,35 @@ def calculate_carbon_footprint(page_size_kb: float, monthly_visits: int = 10000)
     - User device energy consumption
     - Caching and optimization techniques
     """
-    # Calculate annual data transfer in GB
-    annual_data_transfer_gb = (page_size_kb * monthly_visits * 12) / (1024 * 1024)
+    return _carbon_footprint(page_size_kb, monthly_visits)
 
-    # Calculate annual energy consumption
-    annual_energy_kwh = annual_data_transfer_gb * KWH_PER_GB
+@functools.lru_cache(maxsize=256)
+def _carbon_footprint(page_size_kb: float, monthly_visits: int) -> CarbonMetrics:
+    """Compute the footprint metrics; safe to cache since CarbonMetrics is immutable."""
+    batch = calculate_carbon_footprint_batch(np.array([page_size_kb]), np.array([monthly_visits]))
 
-    # Calculate carbon emissions
-    annual_carbon_g = annual_energy_kwh * CARBON_PER_KWH
-    annual_carbon_kg = annual_carbon_g / 1000
+    return CarbonMetrics(
+        page_size_kb=round(page_size_kb, 2),
+        annual_energy_kwh=round(float(batch['annual_energy_kwh'][0]), 2),
+        annual_carbon_kg=round(float(batch['annual_carbon_kg'][0]), 2),
+        trees_needed=int(batch['trees_needed'][0])
+    )
 
-    # Calculate trees needed to offset
-    trees_needed = annual_carbon_kg / TREE_ABSORPTION
+def calculate_carbon_footprint_batch(page_sizes_kb: np.ndarray, monthly_visits: np.ndarray) -> dict[str, np.ndarray]:
+    """
+    Calculate carbon footprint metrics for many pages at once.
+
+    Applies the same methodology as calculate_carbon_footprint elementwise over
+    equally shaped arrays of page sizes (KB) and monthly visits. Values are not
+    rounded; trees_needed is returned as int64.
+    """
+    page_sizes_kb = np.asarray(page_sizes_kb, dtype=np.float64)
+    annual_carbon_kg = page_sizes_kb * monthly_visits * _KG_PER_KB_VISIT_YEAR
+    annual_energy_kwh = annual_carbon_kg * 1000 / CARBON_PER_KWH
 
     return {
-        'page_size_kb': round(page_size_kb, 2),
-        'annual_energy_kwh': round(annual_energy_kwh, 2),
-        'annual_carbon_kg': round(annual_carbon_kg, 2),
-        'trees_needed': math.ceil(trees_needed)
-    }
\ No newline at end of file
+        'page_size_kb': page_sizes_kb,
+        'annual_energy_kwh': annual_energy_kwh,
+        'annual_carbon_kg': annual_carbon_kg,
+        'trees_needed': np.ceil(annual_carbon_kg / TREE_ABSORPTION).astype(np.int64)
+    }
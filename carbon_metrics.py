@@ -0,0 +1,13 @@
+from dataclasses import dataclass, asdict
+
+@dataclass(slots=True, frozen=True)
+class CarbonMetrics:
+    """Carbon footprint metrics for a single page."""
+    page_size_kb: float
+    annual_energy_kwh: float
+    annual_carbon_kg: float
+    trees_needed: int
+
+    def asdict(self) -> dict:
+        """Return the metrics as a plain dict."""
+        return asdict(self)
@@ -1,12 +1,91 @@
 import streamlit as st
-import pandas as pd
-from carbon_calc import validate_url, get_page_size, calculate_carbon_footprint, KWH_PER_GB, CARBON_PER_KWH, TREE_ABSORPTION
+from carbon_calc import validate_url, get_page_size, calculate_carbon_footprint, CarbonMetrics, KWH_PER_GB, CARBON_PER_KWH, TREE_ABSORPTION
 from utils import create_carbon_gauge, create_energy_comparison
 from pdf_generator import create_pdf_report
 from models import get_db, WebsiteMetrics
-from datetime import datetime, timezone
+from datetime import date, datetime, timezone
 import plotly.express as px
 from contextlib import contextmanager
+import time
+
+# Static content, built once per process rather than on every rerun
+RECOMMENDATIONS = (
+    "Optimize images and use modern formats (WebP)",
+    "Implement efficient caching strategies",
+    "Minimize JavaScript and CSS files",
+    "Use a green hosting provider",
+    "Enable compression (GZIP/Brotli)"
+)
+
+CODE_TIPS = {
+    "Optimize Images": [
+        "Use WebP format for images",
+        "Implement lazy loading with 'loading=\"lazy\"' attribute",
+        "Use responsive images with srcset",
+        "Compress images before upload",
+        "Consider using SVG for icons and logos"
+    ],
+    "Minimize Code": [
+        "Minify CSS, JavaScript, and HTML",
+        "Remove unused CSS and JavaScript",
+        "Use code splitting for JavaScript",
+        "Implement tree shaking in your build process",
+        "Avoid redundant code and dependencies"
+    ],
+    "Caching Strategies": [
+        "Implement browser caching with appropriate headers",
+        "Use service workers for offline functionality",
+        "Enable HTTP/2 or HTTP/3 for efficient data transfer",
+        "Set up CDN caching",
+        "Use localStorage for frequently accessed data"
+    ],
+    "Resource Loading": [
+        "Defer non-critical JavaScript loading",
+        "Preload critical assets",
+        "Use async/defer attributes for scripts",
+        "Implement progressive loading",
+        "Optimize web fonts loading"
+    ]
+}
+
+HOSTING_PROVIDERS = (
+    {
+        "name": "Green Geeks",
+        "features": "300% Renewable Energy Match, SSD Storage, Free CDN",
+        "certification": "EPA Green Power Partner"
+    },
+    {
+        "name": "Google Cloud Platform",
+        "features": "Carbon-neutral since 2007, 100% Renewable Energy Match",
+        "certification": "Carbon Neutral Certified"
+    },
+    {
+        "name": "Amazon Web Services (Green)",
+        "features": "100% Renewable Energy Goal, Multiple Green Regions",
+        "certification": "Renewable Energy Certifications"
+    },
+    {
+        "name": "Microsoft Azure",
+        "features": "Carbon Negative by 2030 Goal, Sustainable Datacenters",
+        "certification": "Carbon Neutral Certified"
+    },
+    {
+        "name": "Krystal Hosting",
+        "features": "100% Renewable Energy, UK-based Green Host",
+        "certification": "Certified B Corporation"
+    }
+)
+
+# Pre-rendered markdown so each static block is a single st.markdown call
+RECOMMENDATIONS_MD = "\n".join(f"- {rec}" for rec in RECOMMENDATIONS)
+CODE_TIPS_MD = {
+    category: "  \n".join(f"• {tip}" for tip in tips)
+    for category, tips in CODE_TIPS.items()
+}
+HOSTING_PROVIDERS_MD = "\n".join(
+    ["| Provider | Features | Certification |", "| --- | --- | --- |"]
+    + [f"| {p['name']} | {p['features']} | {p['certification']} |" for p in HOSTING_PROVIDERS]
+)
 
 # Page configuration
 st.set_page_config(
@@ -15,25 +94,56 @@ st.set_page_config(
     layout="wide"
 )
 
-# Load custom CSS
-with open("styles.css") as f:
-    st.markdown(f"<style>{f.read()}</style>", unsafe_allow_html=True)
+# Load custom CSS once per process
+@st.cache_data
+def _load_css() -> str:
+    with open("styles.css") as f:
+        return f"<style>{f.read()}</style>"
+
+st.markdown(_load_css(), unsafe_allow_html=True)
+
+# Seconds a measured page size is reused, in this session and across sessions
+PAGE_SIZE_TTL = 3600
 
 # Initialize session state
 if 'analysis_complete' not in st.session_state:
     st.session_state.analysis_complete = False
-
-# Cache historical data query
-@st.cache_data(ttl=300)  # Cache for 5 minutes
-def get_historical_data(url: str):
-    """Get historical data with error handling and caching."""
+if 'cache' not in st.session_state:
+    st.session_state.cache = {}
+if 'cleared_at' not in st.session_state:
+    st.session_state.cleared_at = 0.0
+
+# Cache historical data query; cleared whenever a new measurement is saved
+@st.cache_data(ttl=60)
+def load_history(url: str, limit: int = 10):
+    """Get historical data as a DataFrame with error handling and caching."""
     try:
         with get_db() as db:
-            return WebsiteMetrics.get_history(db, url)
+            df = WebsiteMetrics.get_history(db, url, limit)
+        df['Date'] = df['timestamp'].dt.strftime('%Y-%m-%d %H:%M')
+        return df.rename(columns={
+            'page_size_kb': 'Page Size (KB)',
+            'annual_energy_kwh': 'Energy (kWh)',
+            'annual_carbon_kg': 'Carbon (kg CO2)',
+            'trees_needed': 'Trees Needed'
+        })[['Date', 'Page Size (KB)', 'Energy (kWh)', 'Carbon (kg CO2)', 'Trees Needed']]
     except Exception as e:
         st.error(f"Error fetching historical data: {str(e)}")
         return None
 
+# Cache page size lookups so repeat analyses skip the network
+@st.cache_data(ttl=PAGE_SIZE_TTL, show_spinner=False)
+def cached_get_page_size(url: str, max_assets: int) -> tuple[float, float]:
+    """Get the page size in KB and when it was measured, cached per URL and resource budget."""
+    return get_page_size(url, max_assets), time.time()
+
+# Cache PDF rendering so a repeated analysis reuses its report; reruns read
+# session_state.pdf_bytes, so only a few recent reports are worth keeping
+@st.cache_data(show_spinner=False, max_entries=32)
+def _make_pdf(url: str, monthly_visits: int, metrics: CarbonMetrics, analysis_date: date) -> bytes:
+    """Render the PDF report, cached per analysis and date."""
+    return create_pdf_report(metrics, url, monthly_visits, analysis_date)
+
 # Header
 st.title("🌱 Website Carbon Footprint Calculator")
 st.markdown("""
@@ -58,6 +168,20 @@ monthly_visits = st.number_input(
     help="Enter the estimated number of monthly visitors to your website"
 )
 
+# Resource budget for power users trading accuracy for speed
+max_assets = st.sidebar.slider(
+    "Max resources to measure",
+    min_value=8,
+    max_value=512,
+    value=64,
+    step=8,
+    help="Pages linking more resources are estimated from this many; higher is more accurate but slower"
+)
+
+if st.sidebar.button("Clear cache", help="Forget this session's analyses so the next one re-measures the page"):
+    st.session_state.cache.clear()
+    st.session_state.cleared_at = time.time()
+
 # Calculate button
 if st.button("Calculate Carbon Footprint", type="primary"):
     if not url:
@@ -67,24 +191,51 @@ if st.button("Calculate Carbon Footprint", type="primary"):
     else:
         try:
             with st.spinner("Analyzing website..."):
-                # Get page size and calculate metrics
-                page_size = get_page_size(url)
-                metrics = calculate_carbon_footprint(page_size, monthly_visits)
-
-                # Store metrics in session state
-                st.session_state.metrics = metrics
-                st.session_state.analysis_url = url
-                st.session_state.monthly_visits = monthly_visits
+                # Get page size and calculate metrics, reusing this session's recent analyses
+                started = time.time()
+                key = (url, monthly_visits, max_assets)
+                cached = st.session_state.cache.get(key)
+                if cached and started - cached[1] < PAGE_SIZE_TTL:
+                    metrics, measured_at, saved = cached
+                else:
+                    page_size, measured_at = cached_get_page_size(url, max_assets)
+                    if measured_at < st.session_state.cleared_at:
+                        # Measured before this session's Clear cache; re-measure without
+                        # evicting the shared entries other sessions are still using
+                        page_size, measured_at = get_page_size(url, max_assets, refresh=True), time.time()
+                    metrics = calculate_carbon_footprint(page_size, monthly_visits)
+                    saved = False
+                    st.session_state.cache[key] = (metrics, measured_at, saved)
+
+                # Save each analysis once; a repeat click for the same inputs is already in the history
+                if saved:
+                    st.info(
+                        f"Showing the result measured at {datetime.fromtimestamp(measured_at):%H:%M}, "
+                        "which is already in the history. Use Clear cache to re-measure."
+                    )
+                else:
+                    try:
+                        with get_db() as db:
+                            WebsiteMetrics.create_measurement(db, url, metrics, monthly_visits)
+                        st.session_state.cache[key] = (metrics, measured_at, True)
+                        load_history.clear()
+                        st.success("Analysis results saved successfully!")
+                    except Exception as e:
+                        st.warning(f"Unable to save measurement for historical tracking: {str(e)}")
+                        st.info("You can still view the current analysis results below.")
+
+                # Store what the history and download sections render; reruns read these back
+                st.session_state.history_df = load_history(url)
+                st.session_state.pdf_bytes = _make_pdf(url, monthly_visits, metrics, date.today())
                 st.session_state.analysis_complete = True
 
-                # Save measurement to database with enhanced error handling
-                try:
-                    with get_db() as db:
-                        WebsiteMetrics.create_measurement(db, url, metrics, monthly_visits)
-                        st.success("Analysis results saved successfully!")
-                except Exception as e:
-                    st.warning(f"Unable to save measurement for historical tracking: {str(e)}")
-                    st.info("You can still view the current analysis results below.")
+                # Bind displayed values once; the transfer figures are derived a single time
+                psize = metrics.page_size_kb
+                energy = metrics.annual_energy_kwh
+                carbon = metrics.annual_carbon_kg
+                trees = metrics.trees_needed
+                monthly_mb = psize * monthly_visits / 1024
+                annual_gb = psize * monthly_visits * 12 / (1024 * 1024)
 
                 # Display metrics in columns
                 col1, col2, col3, col4 = st.columns(4)
@@ -92,28 +243,28 @@ if st.button("Calculate Carbon Footprint", type="primary"):
                 with col1:
                     st.metric(
                         "Page Size",
-                        f"{metrics['page_size_kb']:.2f} KB",
+                        f"{psize:.2f} KB",
                         help="Total size of the webpage including all resources"
                     )
 
                 with col2:
                     st.metric(
                         "Annual Energy",
-                        f"{metrics['annual_energy_kwh']:.2f} kWh",
+                        f"{energy:.2f} kWh",
                         help="Estimated annual energy consumption"
                     )
 
                 with col3:
                     st.metric(
                         "Carbon Emissions",
-                        f"{metrics['annual_carbon_kg']:.2f} kg CO2",
+                        f"{carbon:.2f} kg CO2",
                         help="Estimated annual carbon dioxide emissions"
                     )
 
                 with col4:
                     st.metric(
                         "Trees Needed",
-                        f"{metrics['trees_needed']} trees",
+                        f"{trees} trees",
                         help="Number of trees needed to offset annual emissions"
                     )
 
@@ -123,13 +274,13 @@ if st.button("Calculate Carbon Footprint", type="primary"):
 
                 with viz_col1:
                     st.plotly_chart(
-                        create_carbon_gauge(metrics['annual_carbon_kg']),
+                        create_carbon_gauge(carbon),
                         use_container_width=True
                     )
 
                 with viz_col2:
                     st.plotly_chart(
-                        create_energy_comparison(metrics['annual_energy_kwh']),
+                        create_energy_comparison(energy),
                         use_container_width=True
                     )
 
@@ -140,16 +291,16 @@ if st.button("Calculate Carbon Footprint", type="primary"):
                 with st.expander("1️⃣ Data Transfer Calculation"):
                     st.markdown(f"""
                     We start by measuring your website's total data transfer:
-                    - Page Size: **{metrics['page_size_kb']:.2f} KB** (including HTML, CSS, JavaScript, images)
-                    - Monthly Data Transfer: {metrics['page_size_kb']:.2f} KB × {monthly_visits:,} visits = {metrics['page_size_kb'] * monthly_visits / 1024:.2f} MB
-                    - Annual Data Transfer: {metrics['page_size_kb'] * monthly_visits * 12 / (1024 * 1024):.2f} GB
+                    - Page Size: **{psize:.2f} KB** (including HTML, CSS, JavaScript, images)
+                    - Monthly Data Transfer: {psize:.2f} KB × {monthly_visits:,} visits = {monthly_mb:.2f} MB
+                    - Annual Data Transfer: {annual_gb:.2f} GB
                     """)
 
                 with st.expander("2️⃣ Energy Consumption"):
                     st.markdown(f"""
                     We calculate energy consumption using standard energy intensity metrics:
                     - Energy Intensity: **{KWH_PER_GB} kWh/GB** (kilowatt-hours per gigabyte)
-                    - Annual Energy: {metrics['annual_energy_kwh']:.2f} kWh
+                    - Annual Energy: {energy:.2f} kWh
 
                     This is based on average data center energy efficiency studies.
                     """)
@@ -158,7 +309,7 @@ if st.button("Calculate Carbon Footprint", type="primary"):
                     st.markdown(f"""
                     We convert energy to carbon emissions using global averages:
                     - Carbon Intensity: **{CARBON_PER_KWH} g CO2/kWh** (global grid average)
-                    - Annual Carbon Emissions: {metrics['annual_carbon_kg']:.2f} kg CO2
+                    - Annual Carbon Emissions: {carbon:.2f} kg CO2
 
                     Based on International Energy Agency (IEA) data.
                     """)
@@ -167,7 +318,7 @@ if st.button("Calculate Carbon Footprint", type="primary"):
                     st.markdown(f"""
                     We calculate how many trees would be needed to offset the emissions:
                     - One tree absorbs approximately **{TREE_ABSORPTION} kg CO2** per year
-                    - Trees needed: {metrics['trees_needed']} trees
+                    - Trees needed: {trees} trees
 
                     Based on EPA environmental research data.
                     """)
@@ -190,19 +341,10 @@ if st.session_state.analysis_complete:
     st.markdown("---")
     st.subheader("📈 Historical Analysis")
 
-    # Get historical data with caching
-    historical_data = get_historical_data(st.session_state.analysis_url)
-
-    if historical_data:
-        # Convert to DataFrame for easier visualization
-        df = pd.DataFrame([{
-            'Date': h.timestamp.strftime('%Y-%m-%d %H:%M'),
-            'Page Size (KB)': h.page_size_kb,
-            'Energy (kWh)': h.annual_energy_kwh,
-            'Carbon (kg CO2)': h.annual_carbon_kg,
-            'Trees Needed': h.trees_needed
-        } for h in historical_data])
+    # Historical data fetched when the analysis ran
+    df = st.session_state.history_df
 
+    if df is not None and not df.empty:
         # Historical trends with improved performance
         metrics_to_plot = {
             'Page Size (KB)': 'Page size over time',
@@ -245,17 +387,10 @@ if st.session_state.analysis_complete:
     st.markdown("---")
     st.subheader("📥 Download Detailed Report")
 
-    # Generate PDF report
-    pdf_bytes = create_pdf_report(
-        st.session_state.metrics,
-        st.session_state.analysis_url,
-        st.session_state.monthly_visits
-    )
-
-    # Create download button
+    # Create download button from the report rendered when the analysis ran
     st.download_button(
         label="Download PDF Report",
-        data=pdf_bytes,
+        data=st.session_state.pdf_bytes,
         file_name="carbon_footprint_report.pdf",
         mime="application/pdf",
         key="pdf_download"
@@ -263,91 +398,18 @@ if st.session_state.analysis_complete:
 
     # Recommendations
     st.subheader("💡 Recommendations to Reduce Impact")
-    recommendations = [
-        "Optimize images and use modern formats (WebP)",
-        "Implement efficient caching strategies",
-        "Minimize JavaScript and CSS files",
-        "Use a green hosting provider",
-        "Enable compression (GZIP/Brotli)"
-    ]
-
-    for rec in recommendations:
-        st.markdown(f"- {rec}")
+    st.markdown(RECOMMENDATIONS_MD)
 
     # Code Optimization Tips
     st.markdown("#### 🔧 Code Optimization Tips")
-    code_tips = {
-        "Optimize Images": [
-            "Use WebP format for images",
-            "Implement lazy loading with 'loading=\"lazy\"' attribute",
-            "Use responsive images with srcset",
-            "Compress images before upload",
-            "Consider using SVG for icons and logos"
-        ],
-        "Minimize Code": [
-            "Minify CSS, JavaScript, and HTML",
-            "Remove unused CSS and JavaScript",
-            "Use code splitting for JavaScript",
-            "Implement tree shaking in your build process",
-            "Avoid redundant code and dependencies"
-        ],
-        "Caching Strategies": [
-            "Implement browser caching with appropriate headers",
-            "Use service workers for offline functionality",
-            "Enable HTTP/2 or HTTP/3 for efficient data transfer",
-            "Set up CDN caching",
-            "Use localStorage for frequently accessed data"
-        ],
-        "Resource Loading": [
-            "Defer non-critical JavaScript loading",
-            "Preload critical assets",
-            "Use async/defer attributes for scripts",
-            "Implement progressive loading",
-            "Optimize web fonts loading"
-        ]
-    }
-
-    for category, tips in code_tips.items():
+    for category, tips_md in CODE_TIPS_MD.items():
         with st.expander(f"📌 {category}"):
-            for tip in tips:
-                st.markdown(f"• {tip}")
+            st.markdown(tips_md)
 
     # Green Hosting Providers
     st.markdown("#### 🌿 Recommended Green Hosting Providers")
-    hosting_providers = [
-        {
-            "name": "Green Geeks",
-            "features": "300% Renewable Energy Match, SSD Storage, Free CDN",
-            "certification": "EPA Green Power Partner"
-        },
-        {
-            "name": "Google Cloud Platform",
-            "features": "Carbon-neutral since 2007, 100% Renewable Energy Match",
-            "certification": "Carbon Neutral Certified"
-        },
-        {
-            "name": "Amazon Web Services (Green)",
-            "features": "100% Renewable Energy Goal, Multiple Green Regions",
-            "certification": "Renewable Energy Certifications"
-        },
-        {
-            "name": "Microsoft Azure",
-            "features": "Carbon Negative by 2030 Goal, Sustainable Datacenters",
-            "certification": "Carbon Neutral Certified"
-        },
-        {
-            "name": "Krystal Hosting",
-            "features": "100% Renewable Energy, UK-based Green Host",
-            "certification": "Certified B Corporation"
-        }
-    ]
-
-    for provider in hosting_providers:
-        with st.expander(f"🏢 {provider['name']}"):
-            st.markdown(f"""
-            **Features:** {provider['features']}  
-            **Certification:** {provider['certification']}
-            """)
+    with st.expander("🏢 Provider details"):
+        st.markdown(HOSTING_PROVIDERS_MD)
 
     st.info("""
     **💡 Pro Tips:**
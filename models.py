@@ -1,107 +1,122 @@
-from sqlalchemy import create_engine, Column, Integer, Float, String, DateTime, MetaData
-from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy import create_engine, insert, select, Index, Column, Integer, Float, String, DateTime
+from sqlalchemy.orm import DeclarativeBase, sessionmaker
 from sqlalchemy.pool import QueuePool
 import os
+import functools
 from datetime import datetime
 from contextlib import contextmanager
-from typing import List, Optional
-import time
+from typing import TYPE_CHECKING, List
+from carbon_metrics import CarbonMetrics
 
-# Database connection with retries
-def create_db_engine(retries=3, delay=1):
-    """Create database engine with connection retries."""
+if TYPE_CHECKING:
+    import pandas as pd
+
+# Database connection; pool_pre_ping and pool_recycle transparently replace dead connections
+def create_db_engine():
+    """Create database engine with a health-checked connection pool."""
     DATABASE_URL = os.environ.get('DATABASE_URL')
     if DATABASE_URL and DATABASE_URL.startswith('postgres://'):
         DATABASE_URL = DATABASE_URL.replace('postgres://', 'postgresql://', 1)
 
-    for attempt in range(retries):
-        try:
-            return create_engine(
-                DATABASE_URL,
-                poolclass=QueuePool,
-                pool_size=5,
-                max_overflow=10,
-                pool_timeout=30,
-                pool_recycle=1800,
-                pool_pre_ping=True,
-                connect_args={
-                    'connect_timeout': 10,
-                    'keepalives': 1,
-                    'keepalives_idle': 30,
-                    'keepalives_interval': 10,
-                    'keepalives_count': 5
-                }
-            )
-        except Exception as e:
-            if attempt == retries - 1:
-                raise Exception(f"Failed to create database engine after {retries} attempts: {str(e)}")
-            time.sleep(delay)
+    return create_engine(
+        DATABASE_URL,
+        poolclass=QueuePool,
+        pool_size=5,
+        max_overflow=10,
+        pool_timeout=30,
+        pool_recycle=1800,
+        pool_pre_ping=True,
+        executemany_mode='values_plus_batch',
+        insertmanyvalues_page_size=10000,
+        connect_args={
+            'connect_timeout': 10,
+            'keepalives': 1,
+            'keepalives_idle': 30,
+            'keepalives_interval': 10,
+            'keepalives_count': 5
+        }
+    )
+
+@functools.lru_cache(maxsize=1)
+def get_engine():
+    """Create the database engine on first use and reuse it afterwards."""
+    return create_db_engine()
 
-engine = create_db_engine()
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-Base = declarative_base()
+# Bound to the engine lazily in get_db() so importing this module never connects
+SessionLocal = sessionmaker(autocommit=False, autoflush=False)
+
+class Base(DeclarativeBase):
+    """Declarative base shared by all models; owns the single MetaData registry."""
+    pass
 
 class WebsiteMetrics(Base):
     """Model for storing historical website carbon footprint measurements."""
     __tablename__ = "website_metrics"
 
     id = Column(Integer, primary_key=True, index=True)
-    url = Column(String, index=True)
-    timestamp = Column(DateTime, default=datetime.utcnow, index=True)
+    url = Column(String)
+    timestamp = Column(DateTime, default=datetime.utcnow)
     page_size_kb = Column(Float)
     monthly_visits = Column(Integer)
     annual_energy_kwh = Column(Float)
     annual_carbon_kg = Column(Float)
     trees_needed = Column(Integer)
 
-    @classmethod
-    def create_measurement(cls, db, url: str, metrics: dict, monthly_visits: int) -> Optional['WebsiteMetrics']:
-        """Create a new measurement record with error handling and retries."""
-        max_retries = 3
-        retry_delay = 1
+    # Serves get_history's url filter + newest-first LIMIT as one bounded range scan;
+    # its leading url column also covers plain url lookups, so url has no index of its own
+    __table_args__ = (
+        Index("ix_website_metrics_url_ts", "url", timestamp.desc()),
+    )
 
-        for attempt in range(max_retries):
-            try:
-                new_measurement = cls(
-                    url=url,
-                    page_size_kb=metrics['page_size_kb'],
-                    monthly_visits=monthly_visits,
-                    annual_energy_kwh=metrics['annual_energy_kwh'],
-                    annual_carbon_kg=metrics['annual_carbon_kg'],
-                    trees_needed=metrics['trees_needed']
-                )
-                db.add(new_measurement)
-                db.commit()
-                db.refresh(new_measurement)
-                return new_measurement
-            except Exception as e:
-                db.rollback()
-                if attempt == max_retries - 1:
-                    raise Exception(f"Failed to create measurement after {max_retries} attempts: {str(e)}")
-                time.sleep(retry_delay)
+    @classmethod
+    def create_measurement(cls, db, url: str, metrics: CarbonMetrics, monthly_visits: int) -> None:
+        """Insert a single measurement record; a one-row batch of create_measurements."""
+        cls.create_measurements(db, [{
+            'url': url,
+            'page_size_kb': metrics.page_size_kb,
+            'monthly_visits': monthly_visits,
+            'annual_energy_kwh': metrics.annual_energy_kwh,
+            'annual_carbon_kg': metrics.annual_carbon_kg,
+            'trees_needed': metrics.trees_needed
+        }])
 
     @classmethod
-    def get_history(cls, db, url: str, limit: int = 10) -> List['WebsiteMetrics']:
-        """Get historical measurements for a specific URL with error handling and retries."""
-        max_retries = 3
-        retry_delay = 1
+    def create_measurements(cls, db, rows: List[dict]) -> None:
+        """Insert many measurement records in a single batched round-trip."""
+        # An empty executemany would run one INSERT of defaults, leaving an all-NULL row
+        if not rows:
+            return
+        try:
+            db.execute(insert(cls), rows)
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            raise Exception(f"Failed to save measurements: {str(e)}")
 
-        for attempt in range(max_retries):
-            try:
-                return db.query(cls)\
-                    .filter(cls.url == url)\
-                    .order_by(cls.timestamp.desc())\
-                    .limit(limit)\
-                    .all()
-            except Exception as e:
-                if attempt == max_retries - 1:
-                    raise Exception(f"Failed to fetch historical data after {max_retries} attempts: {str(e)}")
-                time.sleep(retry_delay)
+    @classmethod
+    def get_history(cls, db, url: str, limit: int = 10) -> 'pd.DataFrame':
+        """Get historical measurements for a specific URL as a DataFrame with error handling."""
+        # Deferred so init_db() and the DB layer don't load pandas; the app loads it
+        # anyway once the history chart is drawn (px.line needs it)
+        import pandas as pd
+        try:
+            query = select(
+                cls.timestamp,
+                cls.page_size_kb,
+                cls.annual_energy_kwh,
+                cls.annual_carbon_kg,
+                cls.trees_needed
+            ).where(cls.url == url)\
+                .order_by(cls.timestamp.desc())\
+                .limit(limit)
+            return pd.read_sql(query, db.connection(), parse_dates=['timestamp'])
+        except Exception as e:
+            raise Exception(f"Failed to fetch historical data: {str(e)}")
 
 @contextmanager
 def get_db():
     """Provide a transactional scope around a series of operations with connection handling."""
+    SessionLocal.configure(bind=get_engine())
     db = SessionLocal()
     try:
         yield db
@@ -111,8 +126,12 @@ def get_db():
     finally:
         db.close()
 
-# Create tables
-try:
-    Base.metadata.create_all(bind=engine)
-except Exception as e:
-    raise Exception(f"Failed to create database tables: {str(e)}")
\ No newline at end of file
+def init_db():
+    """Create database tables. Run once via `python models.py`, not on app import."""
+    try:
+        Base.metadata.create_all(bind=get_engine())
+    except Exception as e:
+        raise Exception(f"Failed to create database tables: {str(e)}")
+
+if __name__ == "__main__":
+    init_db()
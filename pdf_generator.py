@@ -5,73 +5,80 @@ from reportlab.platypus import SimpleDocTemplate, Paragraph, Spacer, Table, Tabl
 from reportlab.lib.units import inch
 import io
 import datetime
+from typing import Optional
+from carbon_metrics import CarbonMetrics
 
-def create_pdf_report(metrics: dict, url: str, monthly_visits: int) -> bytes:
-    """Generate a detailed PDF report of the carbon footprint analysis."""
+# Report styles are immutable configuration, so build them once at import
+_STYLES = getSampleStyleSheet()
+
+_TITLE_STYLE = ParagraphStyle(
+    'CustomTitle',
+    parent=_STYLES['Heading1'],
+    spaceAfter=30,
+    fontSize=24,
+    textColor=colors.HexColor('#2ECC71')
+)
+
+_HEADING_STYLE = ParagraphStyle(
+    'CustomHeading',
+    parent=_STYLES['Heading2'],
+    spaceAfter=12,
+    fontSize=14,
+    textColor=colors.HexColor('#2C3E50')
+)
+
+_INFO_TABLE_STYLE = TableStyle([
+    ('GRID', (0, 0), (-1, -1), 1, colors.lightgrey),
+    ('BACKGROUND', (0, 0), (0, -1), colors.HexColor('#F0F4F8')),
+    ('PADDING', (0, 0), (-1, -1), 6),
+])
+
+_METRICS_TABLE_STYLE = TableStyle([
+    ('GRID', (0, 0), (-1, -1), 1, colors.lightgrey),
+    ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#2ECC71')),
+    ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
+    ('PADDING', (0, 0), (-1, -1), 6),
+])
+
+def create_pdf_report(metrics: CarbonMetrics, url: str, monthly_visits: int, analysis_date: Optional[datetime.date] = None) -> bytes:
+    """Generate a detailed PDF report of the carbon footprint analysis, dated analysis_date (default: today)."""
     buffer = io.BytesIO()
     doc = SimpleDocTemplate(buffer, pagesize=letter)
-    styles = getSampleStyleSheet()
     story = []
 
-    # Custom styles
-    title_style = ParagraphStyle(
-        'CustomTitle',
-        parent=styles['Heading1'],
-        spaceAfter=30,
-        fontSize=24,
-        textColor=colors.HexColor('#2ECC71')
-    )
-
-    heading_style = ParagraphStyle(
-        'CustomHeading',
-        parent=styles['Heading2'],
-        spaceAfter=12,
-        fontSize=14,
-        textColor=colors.HexColor('#2C3E50')
-    )
-
     # Title
-    story.append(Paragraph("Website Carbon Footprint Report", title_style))
+    story.append(Paragraph("Website Carbon Footprint Report", _TITLE_STYLE))
     story.append(Spacer(1, 20))
 
     # Basic Information
-    story.append(Paragraph("Analysis Details", heading_style))
-    current_date = datetime.datetime.now().strftime("%Y-%m-%d")
+    story.append(Paragraph("Analysis Details", _HEADING_STYLE))
+    current_date = (analysis_date or datetime.date.today()).strftime("%Y-%m-%d")
     info_data = [
         ["Website URL:", url],
         ["Analysis Date:", current_date],
         ["Monthly Visits:", f"{monthly_visits:,}"]
     ]
     info_table = Table(info_data, colWidths=[2*inch, 4*inch])
-    info_table.setStyle(TableStyle([
-        ('GRID', (0, 0), (-1, -1), 1, colors.lightgrey),
-        ('BACKGROUND', (0, 0), (0, -1), colors.HexColor('#F0F4F8')),
-        ('PADDING', (0, 0), (-1, -1), 6),
-    ]))
+    info_table.setStyle(_INFO_TABLE_STYLE)
     story.append(info_table)
     story.append(Spacer(1, 20))
 
     # Metrics
-    story.append(Paragraph("Carbon Footprint Metrics", heading_style))
+    story.append(Paragraph("Carbon Footprint Metrics", _HEADING_STYLE))
     metrics_data = [
         ["Metric", "Value", "Impact Level"],
-        ["Page Size", f"{metrics['page_size_kb']:.2f} KB", "Information"],
-        ["Annual Energy Consumption", f"{metrics['annual_energy_kwh']:.2f} kWh", "Medium"],
-        ["Annual Carbon Emissions", f"{metrics['annual_carbon_kg']:.2f} kg CO2", "High"],
-        ["Trees Needed for Offset", f"{metrics['trees_needed']} trees", "Action Required"]
+        ["Page Size", f"{metrics.page_size_kb:.2f} KB", "Information"],
+        ["Annual Energy Consumption", f"{metrics.annual_energy_kwh:.2f} kWh", "Medium"],
+        ["Annual Carbon Emissions", f"{metrics.annual_carbon_kg:.2f} kg CO2", "High"],
+        ["Trees Needed for Offset", f"{metrics.trees_needed} trees", "Action Required"]
     ]
     metrics_table = Table(metrics_data, colWidths=[2.5*inch, 2*inch, 1.5*inch])
-    metrics_table.setStyle(TableStyle([
-        ('GRID', (0, 0), (-1, -1), 1, colors.lightgrey),
-        ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#2ECC71')),
-        ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
-        ('PADDING', (0, 0), (-1, -1), 6),
-    ]))
+    metrics_table.setStyle(_METRICS_TABLE_STYLE)
     story.append(metrics_table)
     story.append(Spacer(1, 20))
 
     # Calculation Methodology
-    story.append(Paragraph("Calculation Methodology", heading_style))
+    story.append(Paragraph("Calculation Methodology", _HEADING_STYLE))
     methodology_text = """
     Our carbon footprint calculations are based on industry-standard methodologies and empirical research. Here's how we calculate each metric:
 
@@ -98,11 +105,11 @@ def create_pdf_report(metrics: dict, url: str, monthly_visits: int) -> bytes:
     • Network infrastructure
     • User device energy efficiency
     """
-    story.append(Paragraph(methodology_text, styles['Normal']))
+    story.append(Paragraph(methodology_text, _STYLES['Normal']))
     story.append(Spacer(1, 20))
 
     # Recommendations
-    story.append(Paragraph("Recommendations for Improvement", heading_style))
+    story.append(Paragraph("Recommendations for Improvement", _HEADING_STYLE))
     recommendations = [
         "1. Optimize images and use modern formats (WebP)",
         "2. Implement efficient caching strategies",
@@ -111,14 +118,14 @@ def create_pdf_report(metrics: dict, url: str, monthly_visits: int) -> bytes:
         "5. Enable compression (GZIP/Brotli)"
     ]
     for rec in recommendations:
-        story.append(Paragraph(rec, styles['Normal']))
+        story.append(Paragraph(rec, _STYLES['Normal']))
         story.append(Spacer(1, 6))
 
     # Disclaimer
     story.append(Spacer(1, 30))
     disclaimer = """Note: This report provides estimates based on industry standard calculations. 
     Actual environmental impact may vary depending on specific circumstances and data center configurations."""
-    story.append(Paragraph(disclaimer, styles['Italic']))
+    story.append(Paragraph(disclaimer, _STYLES['Italic']))
 
     # Build PDF
     doc.build(story)
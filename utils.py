@@ -1,8 +1,16 @@
+import streamlit as st
 import plotly.graph_objects as go
 import plotly.express as px
 
+# Activities compared against the website; the first slot is filled per call
+_ACTIVITY_LABELS = ('Your Website', 'LED Bulb (1 year)', 'Laptop (1 month)', 'Phone Charging (1 year)')
+_BASELINE_KWH = (0.0, 55.0, 12.0, 2.0)
+# Figures are keyed by a float that varies per analysis, so cap how many are kept
+_FIGURE_CACHE_ENTRIES = 128
+
+@st.cache_resource(show_spinner=False, max_entries=_FIGURE_CACHE_ENTRIES)
 def create_carbon_gauge(carbon_kg: float) -> go.Figure:
-    """Create a gauge chart for carbon emissions."""
+    """Create a gauge chart for carbon emissions, memoized per value."""
     fig = go.Figure(go.Indicator(
         mode = "gauge+number",
         value = carbon_kg,
@@ -28,18 +36,14 @@ def create_carbon_gauge(carbon_kg: float) -> go.Figure:
     
     return fig
 
+@st.cache_resource(show_spinner=False, max_entries=_FIGURE_CACHE_ENTRIES)
 def create_energy_comparison(energy_kwh: float) -> go.Figure:
-    """Create a bar chart comparing energy usage to common activities."""
-    activities = {
-        'Your Website': energy_kwh,
-        'LED Bulb (1 year)': 55,
-        'Laptop (1 month)': 12,
-        'Phone Charging (1 year)': 2
-    }
+    """Create a bar chart comparing energy usage to common activities, memoized per value."""
+    values = (energy_kwh,) + _BASELINE_KWH[1:]
     
     fig = px.bar(
-        x=list(activities.keys()),
-        y=list(activities.values()),
+        x=_ACTIVITY_LABELS,
+        y=values,
         title="Annual Energy Usage Comparison (kWh)",
         labels={'x': 'Activity', 'y': 'Energy (kWh)'}
     )